@@ -19,6 +19,8 @@ import collections
 import fractions
 import itertools
 
+import numpy as np
+
 import elimination as el
 import numericals as ng
 from parse import AGPoint
@@ -30,9 +32,40 @@ NumCircle = ng.NumCircle
 NumLine = ng.NumLine
 
 
+def pair_key(a, b):
+  """Canonical key for the symmetric pair-indexed dictionaries."""
+  if id(a) <= id(b):
+    return a, b
+  return b, a
+
+
+def triple_key(a, b, c):
+  """Canonical key for the symmetric triple-indexed circle dictionary."""
+  return tuple(sorted((a, b, c), key=id))
+
+
+def _scan_triangles(orients, encountered, identical):
+  """Returns the (i, j, k) index triples surviving the numeric filters.
+
+  A triple survives when its three points are pairwise numerically
+  distinct, not collinear, and the (i, j) pair was encountered by one of
+  the elimination engines. Pure NumPy so the whole N^3 scan runs in a
+  handful of C loops.
+  """
+  mask = (
+      (orients != 0)
+      & encountered[:, :, None]
+      & ~identical[:, None, :]
+      & ~identical[None, :, :]
+  )
+  return np.argwhere(mask).tolist()
+
+
 class FormalLine:
   """Points known to be collinear (immutable)."""
 
+  __slots__ = ('points', 'main_pair', 'direction', 'value')
+
   def __init__(
       self,
       points: list[AGPoint],
@@ -50,6 +83,8 @@ class FormalLine:
 class FormalCircle:
   """Points known to be concyclic, possibly with a center (immutable)."""
 
+  __slots__ = ('defining_points', 'points', 'centers', 'value')
+
   def __init__(
       self,
       defining_points: list[AGPoint],
@@ -70,14 +105,21 @@ class DDAR:
 
     self.points = list(points)
     assert all(isinstance(point, AGPoint) for point in points)
-    self.lines = set()
-    self.circles = set()
+    # iterated far more often than mutated, so plain lists
+    self.lines = []
+    self.circles = []
+    # inverted incidence index: point -> ordered set of objects through it
+    # (dicts with None values, so iteration order stays deterministic)
+    self.point_to_lines = DefaultDict(dict)
+    self.point_to_circles = DefaultDict(dict)
 
     self.elim_dist_mul = el.ElimDistMul()
     self.elim_dist_add = el.ElimDistAdd()
     self.elim_angle = el.ElimAngle()
 
     self.point_subst = {x: x for x in points}
+    # reverse index: surviving point -> the keys substituted to it
+    self._subst_rev = {x: [x] for x in points}
     self.pair_to_line = dict()
 
     # these three dictionaries are (AGPoint, AGPoint) -> LinComb
@@ -86,10 +128,15 @@ class DDAR:
     self.pair_to_dist_mul = dict()
     self.pair_to_dist_add = dict()
     self.pair_to_dir = dict()
+    self.dist_mul_cache = dict()
+    self.direction_cache = dict()
 
-    for a, b in itertools.combinations(self.points, 2):
+    coords = np.array([p.value for p in self.points])
+    dists = np.sqrt(((coords[:, None, :] - coords[None, :, :]) ** 2).sum(-1))
+    for (i, a), (j, b) in itertools.combinations(enumerate(self.points), 2):
 
-      if ng.distance(a.value, b.value) < ng.ATOM:
+      dist = float(dists[i, j])
+      if dist < ng.ATOM:
         continue
 
       num_line = NumLine.through(a.value, b.value)
@@ -101,32 +148,110 @@ class DDAR:
           direction=direction,
           value=num_line,
       )
-      self.pair_to_dir[a, b] = direction
-      self.pair_to_dir[b, a] = direction
-      self.pair_to_line[a, b] = line
-      self.pair_to_line[b, a] = line
-      self.lines.add(line)
-
-      dist = ng.distance(a.value, b.value)
+      self.pair_to_dir[pair_key(a, b)] = direction
+      self.pair_to_line[pair_key(a, b)] = line
+      self.lines.append(line)
+      self._register_line(line)
 
       dist_mul = self.elim_dist_mul.new_var(dist, f'log(|{a} {b}|)')
-      self.pair_to_dist_mul[a, b] = dist_mul
-      self.pair_to_dist_mul[b, a] = dist_mul
+      self.pair_to_dist_mul[pair_key(a, b)] = dist_mul
 
       dist_add = self.elim_dist_add.new_var(dist, f'|{a} {b}|')
-      self.pair_to_dist_add[a, b] = dist_add
-      self.pair_to_dist_add[b, a] = dist_add
+      self.pair_to_dist_add[pair_key(a, b)] = dist_add
+
+      self.dist_mul_cache[pair_key(a, b)] = dist_mul
+      self.direction_cache[pair_key(a, b)] = direction
+
+    # numeric identity of points never changes (coordinates are fixed),
+    # so each point gets a permanent representative of its identity group;
+    # num_identical is then a single dict probe plus identity comparison
+    self._num_rep = dict()
+    reps = []
+    for p in self.points:
+      for r in reps:
+        if pair_key(p, r) not in self.pair_to_dist_mul:
+          self._num_rep[p] = r
+          break
+      else:
+        reps.append(p)
+        self._num_rep[p] = p
 
     self.known_similar = set()
     self.triple_to_circle = (
         dict()
     )  # circles get introduced only once they are interesting
     self.last_small_circles = []  # containing less than 3 points
-    self.dist_mul_cache = dict(self.pair_to_dist_mul)
-    self.direction_cache = dict(self.pair_to_dir)
+    # memoized ratios / angles, valid for one fixed-point iteration
+    self._ratio_cache = dict()
+    self._angle_cache = dict()
+    self._transfer_cache = dict()
+    self._arc_third = dict()
+    # bumped whenever lines / circles / points change structurally
+    self.struct_version = 0
+    self._search_versions = dict()
+    self._index_epoch = 0
+    self._dist_cache_sig = None
+    self._dir_cache_sig = None
+    self._rebuild_point_index()
 
   def num_identical(self, a, b):
-    return (a, b) not in self.pair_to_dist_mul
+    return self._num_rep[a] is self._num_rep[b]
+
+  def _register_line(self, line):
+    for p in line.points:
+      self.point_to_lines[p][line] = None
+
+  def _unregister_line(self, line):
+    for p in line.points:
+      self.point_to_lines[p].pop(line, None)
+
+  def _register_circle(self, circle):
+    for p in circle.points:
+      self.point_to_circles[p][circle] = None
+    for p in circle.centers:
+      self.point_to_circles[p][circle] = None
+
+  def _unregister_circle(self, circle):
+    for p in circle.points:
+      self.point_to_circles[p].pop(circle, None)
+    for p in circle.centers:
+      self.point_to_circles[p].pop(circle, None)
+
+  def _rebuild_point_index(self):
+    """Indexes the current points: identity, coordinates, distances."""
+    self._index_epoch += 1
+    self._indexed_points = list(self.points)
+    self._pt_idx = {id(p): i for i, p in enumerate(self.points)}
+    n = len(self.points)
+    identical = np.ones((n, n), dtype=bool)
+    for i, j in itertools.combinations(range(n), 2):
+      if not self.num_identical(self.points[i], self.points[j]):
+        identical[i, j] = identical[j, i] = False
+    self._identical = identical
+
+    self._distinct_pairs = [
+        (self.points[i], self.points[j])
+        for i, j in itertools.combinations(range(n), 2)
+        if not identical[i, j]
+    ]
+
+    coords = np.array([p.value for p in self.points])
+    self._coords = coords
+    diff = coords[:, None, :] - coords[None, :, :]
+    self._dist = np.sqrt((diff**2).sum(-1))
+    ax = coords[:, None, None, 0]
+    ay = coords[:, None, None, 1]
+    bx = coords[None, :, None, 0]
+    by = coords[None, :, None, 1]
+    cx = coords[None, None, :, 0]
+    cy = coords[None, None, :, 1]
+    det = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    self._orient = (det > ng.ATOM).astype(np.int8) - (det < -ng.ATOM)
+
+  def force_preds(self, preds):
+    """Adds a batch of predicates as assumptions."""
+    for pred in preds:
+      self.force_pred(pred)
 
   def force_pred(self, pred):
     """Adds a predicate as an assumption."""
@@ -146,13 +271,7 @@ class DDAR:
       [num_centers] = pred.constants
       centers = pred.points[:num_centers]
       points = pred.points[num_centers:]
-      distinct_points = []
-      for x in points:
-        if not any(self.num_identical(x, y) for y in distinct_points):
-          distinct_points.append(x)
-          if len(distinct_points) == 3:
-            break
-      if len(distinct_points) >= 3:
+      if len({self._num_rep[x] for x in points}) >= 3:
         self.force_concyclic(points, centers)
       else:
         a0 = points[0]
@@ -180,36 +299,39 @@ class DDAR:
       comb = el.LinComb.zero()
       for i, coef in enumerate(coefs):
         a, b = pred.points[2 * i : 2 * (i + 1)]
-        comb.iadd_mul(self.pair_to_dir[a, b].comb, coef)
+        comb.iadd_mul(self.pair_to_dir[pair_key(a, b)].comb, coef)
       comb += self.elim_angle.const_frac(Fraction(const) / 180).comb
       return el.FormalAngle(comb)
     elif pred.name == 'eqangle':
       a1, a2, b1, b2, c1, c2, d1, d2 = pred.points
-      ang1 = self.pair_to_dir[a1, a2] - self.pair_to_dir[b1, b2]
-      ang2 = self.pair_to_dir[c1, c2] - self.pair_to_dir[d1, d2]
-      return ang1 - ang2
+      comb = el.LinComb.zero()
+      comb.iadd_mul(self.pair_to_dir[pair_key(a1, a2)].comb, 1)
+      comb.iadd_mul(self.pair_to_dir[pair_key(b1, b2)].comb, -1)
+      comb.iadd_mul(self.pair_to_dir[pair_key(c1, c2)].comb, -1)
+      comb.iadd_mul(self.pair_to_dir[pair_key(d1, d2)].comb, 1)
+      return el.FormalAngle(comb)
     elif pred.name == 'para':
       a1, a2, b1, b2 = pred.points
-      ang = self.pair_to_dir[a1, a2] - self.pair_to_dir[b1, b2]
+      ang = self.pair_to_dir[pair_key(a1, a2)] - self.pair_to_dir[
+          pair_key(b1, b2)
+      ]
       return ang
     elif pred.name == 'perp':
       a1, a2, b1, b2 = pred.points
-      ang = (
-          self.pair_to_dir[a1, a2]
-          - self.pair_to_dir[b1, b2]
-          - self.elim_angle.const(1, 2)
-      )
-      return ang
+      comb = el.LinComb.zero()
+      comb.iadd_mul(self.pair_to_dir[pair_key(a1, a2)].comb, 1)
+      comb.iadd_mul(self.pair_to_dir[pair_key(b1, b2)].comb, -1)
+      comb.iadd_mul(self.elim_angle.const(1, 2).comb, -1)
+      return el.FormalAngle(comb)
     elif pred.name in ['s_angle', 'aconst']:
       a1, a2, b1, b2 = pred.points
       [ang] = pred.constants
       ang = Fraction(ang) / Fraction(180)
-      ang0 = (
-          self.pair_to_dir[a1, a2]
-          - self.pair_to_dir[b1, b2]
-          - self.elim_angle.const_frac(ang)
-      )
-      return ang0
+      comb = el.LinComb.zero()
+      comb.iadd_mul(self.pair_to_dir[pair_key(a1, a2)].comb, 1)
+      comb.iadd_mul(self.pair_to_dir[pair_key(b1, b2)].comb, -1)
+      comb.iadd_mul(self.elim_angle.const_frac(ang).comb, -1)
+      return el.FormalAngle(comb)
     else:
       raise ValueError('Not an angle predicate:', pred.name)
 
@@ -223,7 +345,7 @@ class DDAR:
       comb = el.LinComb.zero()
       for i, coef in enumerate(coefs):
         a, b = pred.points[2 * i : 2 * (i + 1)]
-        comb.iadd_mul(self.pair_to_dist_mul[a, b].comb, coef)
+        comb.iadd_mul(self.pair_to_dist_mul[pair_key(a, b)].comb, coef)
       return el.DistMul(comb) * const
     elif pred.name == 'cong':
       a, b, c, d = pred.points
@@ -251,7 +373,7 @@ class DDAR:
       comb = el.LinComb.zero()
       for i, coef in enumerate(pred.constants):
         a, b = pred.points[2 * i : 2 * (i + 1)]
-        comb.iadd_mul(self.pair_to_dist_add[a, b].comb, coef)
+        comb.iadd_mul(self.pair_to_dist_add[pair_key(a, b)].comb, coef)
       return el.DistAdd(comb)
     else:
       raise ValueError('Not a sum predicate:', pred.name)
@@ -288,7 +410,9 @@ class DDAR:
       return self.check_equal_points(a, b)
     elif pred.name == 'acompute':
       a1, a2, b1, b2 = pred.points
-      ang = self.pair_to_dir[a1, a2] - self.pair_to_dir[b1, b2]
+      ang = self.pair_to_dir[pair_key(a1, a2)] - self.pair_to_dir[
+          pair_key(b1, b2)
+      ]
       ang = self.elim_angle.simplify(ang)
       if all(v == el.angle_unit for v in ang.comb.d.keys()):
         return ang.comb.d.get(el.angle_unit, Fraction(0))
@@ -301,6 +425,16 @@ class DDAR:
   def deduction_closure(self, verbose=False, progress_dot=True):
     """Infers all further facts deducible on the given point."""
     # self.elim_dist_mul.core.display()
+    def run_fresh(name, routine, *engines):
+      # skip a routine whose inputs did not change since its last run;
+      # the signature is taken before running so that a routine seeing
+      # its own deductions is re-run on the next pass
+      sig = (self.struct_version,) + tuple(e.version for e in engines)
+      if self._search_versions.get(name) == sig:
+        return False
+      self._search_versions[name] = sig
+      return routine()
+
     changed = True
     while changed:
       # for _ in range(5):
@@ -311,7 +445,12 @@ class DDAR:
 
       if verbose:
         print('  Similar triangles...')
-      changed_last = self.search_similar(verbose=verbose)
+      changed_last = run_fresh(
+          'similar',
+          lambda: self.search_similar(verbose=verbose),
+          self.elim_angle,
+          self.elim_dist_mul,
+      )
       changed = changed or changed_last
       if changed_last:
         self.update_cache()
@@ -321,7 +460,9 @@ class DDAR:
 
       if verbose:
         print('  Cyclic quadrilaterals...   ', end='')
-      changed_last = self.search_concyclic()
+      changed_last = run_fresh(
+          'concyclic', self.search_concyclic, self.elim_angle, self.elim_dist_mul
+      )
       changed = changed or changed_last
       if changed_last:
         self.update_cache()
@@ -330,28 +471,38 @@ class DDAR:
 
       if verbose:
         print('  Circles...                 ', end='')
-      changed_last = self.search_circles()
+      changed_last = run_fresh('circles', self.search_circles, self.elim_dist_mul)
       changed = changed or changed_last
       if verbose:
         print(['----', 'Updated'][changed_last])
 
       if verbose:
         print('  Merging points...          ', end='')
-      changed_last = self.merge_points()
+      changed_last = run_fresh('merge', self.merge_points, self.elim_dist_mul)
       changed = changed or changed_last
       if verbose:
         print(['----', 'Updated'][changed_last])
 
       if verbose:
         print('  Sync add / mul dist...     ', end='')
-      changed_last = self.transfer_dist_add_mul()
+      changed_last = run_fresh(
+          'add_mul',
+          self.transfer_dist_add_mul,
+          self.elim_dist_mul,
+          self.elim_dist_add,
+      )
       changed = changed or changed_last
       if verbose:
         print(['----', 'Updated'][changed_last])
 
       if verbose:
         print('  Sync segments / arcs...    ', end='')
-      changed_last = self.transfer_dist_arc_mul()
+      changed_last = run_fresh(
+          'arc_mul',
+          self.transfer_dist_arc_mul,
+          self.elim_angle,
+          self.elim_dist_mul,
+      )
       changed = changed or changed_last
       if verbose:
         print(['----', 'Updated'][changed_last])
@@ -364,68 +515,97 @@ class DDAR:
     ssa = dict()
     ssa_triangles = set()
     similar_pairs = []
-    count = 0
-    for a in self.points:
-      for b in self.points:
-        if self.num_identical(a, b):
-          continue
-        encountered = self.elim_angle.was_encountered(
-            self.pair_to_dir[a, b]
-        ) or self.elim_dist_mul.was_encountered(self.pair_to_dist_mul[a, b])
-        if not encountered:
-          continue
-        for c in self.points:
-          if self.num_identical(a, c):
-            continue
-          if self.num_identical(b, c):
-            continue
-          orient = ng.orientation(a.value, b.value, c.value)
-          if orient == 0:
-            continue
-          count += 1
-          rat1 = self.get_dist_ratio(a, b, a, c)
-          ang1 = self.get_point_angle(a, b, a, c)
-          rat2 = self.get_dist_ratio(c, b, c, a)
-          ang2 = self.get_point_angle(c, b, c, a)
-
-          if (rat1, rat2) in sss:
-            (a0, b0, c0), (_, _) = sss[rat1, rat2]
-            similar_pairs.append(((a0, b0, c0), (a, b, c)))
-          else:
-            sss[rat1, rat2] = (a, b, c), (rat1, rat2)
 
-          if (ang1, ang2) in aa:
-            (a0, b0, c0), (_, _) = aa[ang1, ang2]
-            similar_pairs.append(((a0, b0, c0), (a, b, c)))
-          else:
-            aa[ang1, ang2] = (a, b, c), (ang1, ang2)
-            aa[-ang1, -ang2] = (a, b, c), (-ang1, -ang2)
-
-          if (ang1, rat1, orient) in sas:
-            (a0, b0, c0), (_, _) = sas[ang1, rat1, orient]
-            similar_pairs.append(((a0, b0, c0), (a, b, c)))
+    # batch the numerical part: the precomputed orientation tensor,
+    # distance matrix and pair masks filter the triples up front, and only
+    # the survivors go through the (expensive) symbolic ratio / angle
+    # extraction below
+    points = self.points
+    n = len(points)
+    dist = self._dist
+
+    # bind the hot lookups once; the triple loop below runs millions of
+    # times on the larger problems
+    pair_to_dir = self.pair_to_dir
+    pair_to_dist_mul = self.pair_to_dist_mul
+    angle_encountered = self.elim_angle.was_encountered
+    dist_encountered = self.elim_dist_mul.was_encountered
+    get_dist_ratio = self.get_dist_ratio
+    get_point_angle = self.get_point_angle
+
+    identical = self._identical
+    encountered = np.zeros((n, n), dtype=bool)
+    for i, j in itertools.combinations(range(n), 2):
+      if identical[i, j]:
+        continue
+      a = points[i]
+      b = points[j]
+      encountered[i, j] = encountered[j, i] = angle_encountered(
+          pair_to_dir[pair_key(a, b)]
+      ) or dist_encountered(pair_to_dist_mul[pair_key(a, b)])
+
+    orients = self._orient
+    triples = _scan_triangles(orients, encountered, identical)
+    count = len(triples)
+
+    for i, j, k in triples:
+      a = points[i]
+      b = points[j]
+      c = points[k]
+      orient = int(orients[i, j, k])
+      rat1 = get_dist_ratio(a, b, a, c)
+      ang1 = get_point_angle(a, b, a, c)
+      rat2 = get_dist_ratio(c, b, c, a)
+      ang2 = get_point_angle(c, b, c, a)
+
+      if (rat1, rat2) in sss:
+        (a0, b0, c0), (_, _) = sss[rat1, rat2]
+        similar_pairs.append(((a0, b0, c0), (a, b, c)))
+      else:
+        sss[rat1, rat2] = (a, b, c), (rat1, rat2)
+
+      # angle keys are stored with a single sign; the mirrored triangle is
+      # found by also probing the negated key, so neither table holds the
+      # duplicate [-ang, ...] entries
+      neg_ang1 = None
+
+      hit = aa.get((ang1, ang2))
+      if hit is None:
+        neg_ang1 = -ang1
+        hit = aa.get((neg_ang1, -ang2))
+      if hit is not None:
+        (a0, b0, c0), (_, _) = hit
+        similar_pairs.append(((a0, b0, c0), (a, b, c)))
+      else:
+        aa[ang1, ang2] = (a, b, c), (ang1, ang2)
+
+      hit = sas.get((ang1, rat1, orient))
+      if hit is None:
+        if neg_ang1 is None:
+          neg_ang1 = -ang1
+        hit = sas.get((neg_ang1, rat1, -orient))
+      if hit is not None:
+        (a0, b0, c0), (_, _) = hit
+        similar_pairs.append(((a0, b0, c0), (a, b, c)))
+      else:
+        sas[ang1, rat1, orient] = (a, b, c), (ang1, rat1)
+
+      for a1, b1, c1, i1, k1, ang, rat, cur_orient in (
+          (a, b, c, i, k, ang1, rat2, orient),
+          (c, b, a, k, i, ang2, rat1, -orient),
+      ):
+        if dist[k1, j] - dist[k1, i1] > ng.ATOM:
+          if (a1, b1, c1) in ssa_triangles:
+            continue
+          ssa_triangles.add((a1, b1, c1))
+          hit = ssa.get((ang, rat, cur_orient))
+          if hit is None:
+            hit = ssa.get((-ang, rat, -cur_orient))
+          if hit is not None:
+            (a0, b0, c0), (_, _) = hit
+            similar_pairs.append(((a0, b0, c0), (a1, b1, c1)))
           else:
-            sas[ang1, rat1, orient] = (a, b, c), (ang1, rat1)
-            sas[-ang1, rat1, -orient] = (a, b, c), (-ang1, rat1)
-
-          for a1, b1, c1, ang, rat, cur_orient in (
-              (a, b, c, ang1, rat2, orient),
-              (c, b, a, ang2, rat1, -orient),
-          ):
-            if (
-                ng.distance(c1.value, b1.value)
-                - ng.distance(c1.value, a1.value)
-                > ng.ATOM
-            ):
-              if (a1, b1, c1) in ssa_triangles:
-                continue
-              ssa_triangles.add((a1, b1, c1))
-              if (ang, rat, cur_orient) in ssa:
-                (a0, b0, c0), (_, _) = ssa[ang, rat, cur_orient]
-                similar_pairs.append(((a0, b0, c0), (a1, b1, c1)))
-              else:
-                ssa[ang, rat, cur_orient] = (a1, b1, c1), (ang, rat)
-                ssa[-ang, rat, -cur_orient] = (a1, b1, c1), (-ang, rat)
+            ssa[ang, rat, cur_orient] = (a1, b1, c1), (ang, rat)
 
     if verbose:
       print(f'    {count} triangles checked')
@@ -440,14 +620,13 @@ class DDAR:
   def search_concyclic(self):
     """Looks for cyclic quadrilaterals, and infers appropriate facts."""
     changed = False
-    for a in self.points:
-      for b in self.points:
-        ang_to_points_centers = DefaultDict(lambda: ([], []))
+    identical = self._identical
+    for i, a in enumerate(self.points):
+      for j, b in enumerate(self.points):
+        ang_to_points_centers = dict()
         on_line = []
-        for c in self.points:
-          if self.num_identical(a, c):
-            continue
-          if self.num_identical(b, c):
+        for k, c in enumerate(self.points):
+          if identical[i, k] or identical[j, k]:
             continue
 
           # 'c' on the circle
@@ -456,20 +635,24 @@ class DDAR:
           if ang.is_zero():
             on_line.append(c)
 
-          if self.num_identical(a, b):
+          if identical[i, j]:
             continue
 
           if not ng.collinear(a.value, b.value, c.value):
-            points, _ = ang_to_points_centers[ang]
-            points.append(c)
+            bucket = ang_to_points_centers.get(ang)
+            if bucket is None:
+              bucket = ang_to_points_centers[ang] = ([], [])
+            bucket[0].append(c)
 
           dist_ratio = self.get_dist_ratio(c, a, c, b)
           if dist_ratio.is_one():  # 'c' as a center
             halfang = self.get_point_angle(a, c, a, b) + self.elim_angle.const(
                 1, 2
             )
-            _, centers = ang_to_points_centers[halfang]
-            centers.append(c)
+            bucket = ang_to_points_centers.get(halfang)
+            if bucket is None:
+              bucket = ang_to_points_centers[halfang] = ([], [])
+            bucket[1].append(c)
 
         for c in on_line:
           changed = self.force_collinear([a, b, c]) or changed
@@ -499,14 +682,10 @@ class DDAR:
       for _, points in dist_to_points.items():
         if len(points) <= 1:
           continue
-        distinct_points = []
-        for point, _ in points:
-          if any(self.num_identical(point, x) for x in distinct_points):
-            continue
-          distinct_points.append(point)
+        distinct = {self._num_rep[point] for point, _ in points}
         points_only = [point for point, _ in points]
 
-        if len(distinct_points) >= 3:
+        if len(distinct) >= 3:
           changed = self.force_concyclic(points_only, (a,)) or changed
         else:
           self.last_small_circles.append(
@@ -527,24 +706,41 @@ class DDAR:
     """Looks for points that are provably equal, and merges them."""
 
     changed = False
-    # find objects passing through pairs of equal points
+    # find objects passing through pairs of equal points;
+    # the pairs are keyed by (smaller, larger) dense point index so that
+    # each unordered pair of an object is probed exactly once
+    points = list(self.points)
+    idx = {id(p): i for i, p in enumerate(points)}
     same_pairs = {
-        (a, b): []
-        for a, b in itertools.combinations(self.points, 2)
-        if self.num_identical(a, b)
+        (i, j): []
+        for i, j in itertools.combinations(range(len(points)), 2)
+        if self.num_identical(points[i], points[j])
     }
     if not same_pairs:
       return False
 
+    # most objects contain no endpoint of any equal pair; restrict the
+    # pair probing to the points that can actually match
+    candidates = set()
+    for i, j in same_pairs:
+      candidates.add(id(points[i]))
+      candidates.add(id(points[j]))
+
     for obj in itertools.chain(
         self.lines, self.last_small_circles, self.circles
     ):
-      for a in obj.points:
-        for b in obj.points:
-          l = same_pairs.get((a, b))
-          if l is None:
-            continue
-          l.append(obj)
+      hits = [p for p in obj.points if id(p) in candidates]
+      if len(hits) < 2:
+        continue
+      for a, b in itertools.combinations(hits, 2):
+        i = idx[id(a)]
+        j = idx[id(b)]
+        if j < i:
+          i, j = j, i
+        l = same_pairs.get((i, j))
+        if l is None:
+          continue
+        l.append(obj)
 
     # merge multiple centers of the same circle
     for circle in list(self.circles):
@@ -553,9 +749,11 @@ class DDAR:
           self.force_equal_points(circle.centers[0], center)
 
     # if two such objects for a single pair are not tangent, merge them
-    for (a, b), objs in same_pairs.items():
+    for (i, j), objs in same_pairs.items():
       if len(objs) <= 1:
         continue
+      a = points[i]
+      b = points[j]
       intersection_dirs = []
       for obj in objs:
         if isinstance(obj, FormalCircle):
@@ -587,25 +785,33 @@ class DDAR:
     changed = False
     mul_to_add = dict()
     add_to_mul = dict()
-    for a, b in itertools.combinations(self.points, 2):
-      if self.num_identical(a, b):
-        continue
-      mul = self.get_dist_mul(a, b)
-      add = self.get_dist_add(a, b)
-      mul_n, mul_coef = mul.normalize()
-      add_n, add_coef = add.normalize()
-      # mul_n = mul / mul_coef
-      # add_n = add / add_coef
-      mul1 = mul / add_coef  # add_n in multiplicative representation
-      add1 = add / mul_coef  # mul_n in additive representation
-      assert abs(add_n.value - mul1.value) ** 2 < ng.ATOM, (
-          add_n.value,
-          mul1.value,
-      )
-      assert abs(mul_n.value - add1.value) ** 2 < ng.ATOM, (
-          mul_n.value,
-          add1.value,
-      )
+    if self._indexed_points != self.points:
+      self._rebuild_point_index()  # merge_points may have run in between
+    for a, b in self._distinct_pairs:
+      # the normalized forms only change when one of the elimination cores
+      # accepted a new constraint, so reuse them across fixed-point passes
+      versions = (self.elim_dist_mul.version, self.elim_dist_add.version)
+      entry = self._transfer_cache.get((id(a), id(b)))
+      if entry is not None and entry[0] == versions:
+        _, mul_n, add_n, mul1, add1 = entry
+      else:
+        mul = self.get_dist_mul(a, b)
+        add = self.get_dist_add(a, b)
+        mul_n, mul_coef = mul.normalize()
+        add_n, add_coef = add.normalize()
+        # mul_n = mul / mul_coef
+        # add_n = add / add_coef
+        mul1 = mul / add_coef  # add_n in multiplicative representation
+        add1 = add / mul_coef  # mul_n in additive representation
+        assert abs(add_n.value - mul1.value) ** 2 < ng.ATOM, (
+            add_n.value,
+            mul1.value,
+        )
+        assert abs(mul_n.value - add1.value) ** 2 < ng.ATOM, (
+            mul_n.value,
+            add1.value,
+        )
+        self._transfer_cache[id(a), id(b)] = (versions, mul_n, add_n, mul1, add1)
       if mul_n in mul_to_add:
         add2 = mul_to_add[mul_n]
         changed = self.elim_dist_add.force_zero(add2 - add1) or changed
@@ -633,7 +839,7 @@ class DDAR:
             continue
           arc, _ = self.get_arc(circle, a, b)
           arc_val = self.elim_angle.simplify(arc)
-          dist = self.pair_to_dist_mul[a, b]
+          dist = self.pair_to_dist_mul[pair_key(a, b)]
           dist_val = self.elim_dist_mul.simplify(dist)
           if arc_val in arc_to_src:
             dist2 = arc_to_src[arc_val]
@@ -654,19 +860,10 @@ class DDAR:
       return False
     a, b, c = triangle1
     x, y, z = triangle2
-    self.known_similar.add(((a, b, c), (x, y, z)))
-    self.known_similar.add(((a, c, b), (x, z, y)))
-    self.known_similar.add(((b, a, c), (y, x, z)))
-    self.known_similar.add(((c, a, b), (z, x, y)))
-    self.known_similar.add(((b, c, a), (y, z, x)))
-    self.known_similar.add(((c, b, a), (z, y, x)))
-
-    self.known_similar.add(((x, y, z), (a, b, c)))
-    self.known_similar.add(((x, z, y), (a, c, b)))
-    self.known_similar.add(((y, x, z), (b, a, c)))
-    self.known_similar.add(((z, x, y), (c, a, b)))
-    self.known_similar.add(((y, z, x), (b, c, a)))
-    self.known_similar.add(((z, y, x), (c, b, a)))
+    perms1 = ((a, b, c), (a, c, b), (b, a, c), (c, a, b), (b, c, a), (c, b, a))
+    perms2 = ((x, y, z), (x, z, y), (y, x, z), (z, x, y), (y, z, x), (z, y, x))
+    self.known_similar.update(zip(perms1, perms2))
+    self.known_similar.update(zip(perms2, perms1))
 
     # print("Similar:", a,b,c, ", ", x,y,z)
     t1_rat1 = self.get_dist_ratio(a, b, a, c)
@@ -700,16 +897,15 @@ class DDAR:
   def force_collinear(self, points):
     """Adds a fact that the given points are collinear."""
     assert len(points) > 1
-    a = points[0]
-    b = max(points, key=lambda b: ng.distance(a.value, b.value))
-    c = max(points, key=lambda c: ng.distance(c.value, b.value))
-    del a
+    coords = np.array([point.value for point in points])
+    b = points[ng.distances(coords, coords[0]).argmax()]
+    c = points[ng.distances(coords, b.value).argmax()]
     if self.num_identical(b, c):
       raise ValueError(
           'Collinearity predicate require at least two points to be distinct'
       )
-    line1 = self.pair_to_line[b, c]
-    if not all(line1.value.distance(point.value) < ng.ATOM for point in points):
+    line1 = self.pair_to_line[pair_key(b, c)]
+    if not (np.abs(line1.value.c - coords @ line1.value.n) < ng.ATOM).all():
       raise ValueError(
           'Points not numerically collinear: ' + ' '.join(map(str, points))
       )
@@ -726,20 +922,28 @@ class DDAR:
       x = stack.pop()
       if x in points_set:
         continue
-      for y in points:
-        if self.num_identical(x, y):
-          continue
-        line = self.pair_to_line.get((x, y))
+      # only the lines through x can be merged; a line qualifies once it
+      # shares a (numerically distinct) point with the merged set
+      for line in list(self.point_to_lines[x]):
         if line in lines_set:
           continue
+        if not any(
+            y in points_set and not self.num_identical(x, y)
+            for y in line.points
+        ):
+          continue
         lines.append(line)
         lines_set.add(line)
         stack.extend(line.points)
       points.append(x)
       points_set.add(x)
 
-    # sort points
-    points = sorted(points, key=lambda point: line1.value.position(point.value))
+    # sort points along the line; stable so numerically identical points
+    # keep their relative order, as with sorted()
+    positions = -np.array([point.value for point in points]) @ ng.perp_rot(
+        line1.value.n
+    )
+    points = [points[i] for i in np.argsort(positions, kind='stable')]
 
     # order the points
     main_line = FormalLine(
@@ -752,20 +956,36 @@ class DDAR:
     # additive segments on the line
     a = points[0]
     a1 = points[-1]
+    p2l = self.pair_to_line
+    p2a = self.pair_to_dist_add
+    # position of each point as seen from 'a', built once instead of per
+    # pair (points numerically equal to 'a' go through the far end 'a1')
+    pos = dict()
+    identical_to_a = dict()
+    for x in points[1:]:
+      if self.num_identical(a, x):
+        pos[x] = p2a[pair_key(a, a1)] - p2a[pair_key(a1, x)]
+        identical_to_a[x] = True
+      else:
+        pos[x] = p2a[pair_key(a, x)]
+        identical_to_a[x] = False
     for b, c in itertools.combinations(points[1:], 2):
       if self.num_identical(b, c):
         continue
-      if self.num_identical(a, b):
-        pos_b = self.pair_to_dist_add[a, a1] - self.pair_to_dist_add[a1, b]
-      else:
-        pos_b = self.pair_to_dist_add[a, b]
-      if self.num_identical(a, c):
-        pos_c = self.pair_to_dist_add[a, a1] - self.pair_to_dist_add[a1, c]
-      else:
-        pos_c = self.pair_to_dist_add[a, c]
-      self.elim_dist_add.force_zero(
-          pos_b + self.pair_to_dist_add[b, c] - pos_c,
-      )
+      # if a, b, c already sit on one multi-point line, that line's
+      # force_collinear call emitted equations spanning this one; skip it
+      # (the identical special cases use a frame point that may differ
+      # from the old line's, so they are not skipped)
+      if not identical_to_a[b] and not identical_to_a[c]:
+        line_ab = p2l.get(pair_key(a, b))
+        if (
+            line_ab is not None
+            and len(line_ab.points) > 2
+            and p2l.get(pair_key(b, c)) is line_ab
+            and p2l.get(pair_key(a, c)) is line_ab
+        ):
+          continue
+      self.elim_dist_add.force_zero(pos[b] + p2a[pair_key(b, c)] - pos[c])
 
     a, b = main_line.main_pair
     # glue the directions of the other lines
@@ -773,12 +993,16 @@ class DDAR:
       self.elim_angle.force_zero(main_line.direction - line.direction)
 
     # replace the old lines with the new one
-    self.lines.difference_update(lines)
-    self.lines.add(main_line)
+    self.struct_version += 1
+    removed = set(lines)
+    self.lines = [line for line in self.lines if line not in removed]
+    self.lines.append(main_line)
+    for line in lines:
+      self._unregister_line(line)
+    self._register_line(main_line)
     for x, y in itertools.combinations(main_line.points, 2):
       if not self.num_identical(x, y):
-        self.pair_to_line[x, y] = main_line
-        self.pair_to_line[y, x] = main_line
+        self.pair_to_line[pair_key(x, y)] = main_line
 
     return True
 
@@ -802,7 +1026,7 @@ class DDAR:
           continue
         if self.num_identical(b, c):
           continue
-        circle = self.triple_to_circle.get((a, b, c))
+        circle = self.triple_to_circle.get(triple_key(a, b, c))
         if circle is None or circle in circles_set:
           continue
         if not circles:
@@ -838,7 +1062,9 @@ class DDAR:
         p1, p2, p3 = (x.value for x in defining_points)
         circle_value = NumCircle.through(p1, p2, p3)
 
-    if not all(circle_value.distance(x.value) ** 2 < ng.ATOM for x in points):
+    coords = np.array([x.value for x in points])
+    errors = np.abs(ng.distances(coords, circle_value.center) - circle_value.r)
+    if not (errors**2 < ng.ATOM).all():
       print([circle_value.distance(x.value) ** 2 for x in points])
       points_str = ' '.join(map(str, points))
       if centers:
@@ -875,37 +1101,53 @@ class DDAR:
         y2 = b
       else:
         y2 = c
-      ang = self.pair_to_dir[x, y2] - self.pair_to_dir[x, y]
+      ang = self.pair_to_dir[pair_key(x, y2)] - self.pair_to_dir[
+          pair_key(x, y)
+      ]
       arc, _ = self.get_arc(main_circle, y, y2)
       self.elim_angle.force_zero(ang - arc)
 
     # equal distance from the center
     if centers:
-      radius = self.get_dist_mul(points[0], centers[0])
       center = centers[0]
+      # a merged circle that ran this loop with the same leading center
+      # already tied its points together; with the reference point among
+      # them, those equations subsume ours
+      covered = set()
+      for circle in circles:
+        if circle.centers and circle.centers[0] is center:
+          if points[0] in circle.points:
+            covered.update(circle.points)
+      radius = self.get_dist_mul(points[0], center)
       for x in points[1:]:
+        if x in covered:
+          continue
         dist = self.get_dist_mul(x, center)
         self.elim_dist_mul.force_one(radius / dist)
 
     # Exchange circle in the database
-    self.circles.difference_update(circles)
-    self.circles.add(main_circle)
-    for a in points:
-      for b in points:
-        if self.num_identical(a, b):
-          continue
-        for c in points:
-          if self.num_identical(a, c):
-            continue
-          if self.num_identical(b, c):
-            continue
-          self.triple_to_circle[a, b, c] = main_circle
+    self.struct_version += 1
+    removed = set(circles)
+    self.circles = [c for c in self.circles if c not in removed]
+    self.circles.append(main_circle)
+    for circle in circles:
+      self._unregister_circle(circle)
+    self._register_circle(main_circle)
+    rep = self._num_rep
+    keys = [
+        triple_key(a, b, c)
+        for a, b, c in itertools.combinations(points, 3)
+        if rep[a] is not rep[b]
+        and rep[a] is not rep[c]
+        and rep[b] is not rep[c]
+    ]
+    self.triple_to_circle.update(dict.fromkeys(keys, main_circle))
 
     return True
 
   def check_collinear(self, points):
     for a, b in itertools.combinations(points, 2):
-      line = self.pair_to_line.get((a, b))
+      line = self.pair_to_line.get(pair_key(a, b))
       if line is None:
         continue
       return set(points) <= set(line.points)
@@ -914,14 +1156,19 @@ class DDAR:
     """Returns whether the points are known to be concyclic."""
 
     distinct_points = []
+    seen = set()
     for point in points:
-      if any(self.num_identical(point, x) for x in distinct_points):
+      rep = self._num_rep[point]
+      if rep in seen:
         continue
+      seen.add(rep)
       distinct_points.append(point)
+      if len(distinct_points) == 3:
+        break
     if len(distinct_points) < 3:
       raise ValueError('Need at least three numerically distinct points')
 
-    circle = self.triple_to_circle.get(tuple(distinct_points[:3]))
+    circle = self.triple_to_circle.get(triple_key(*distinct_points))
 
     if circle is None:
       return False
@@ -941,8 +1188,8 @@ class DDAR:
     if a == b:
       return False
 
-    # merge in lines
-    for line in list(self.lines):
+    # merge in lines; only the lines through a or b can be affected
+    for line in list({**self.point_to_lines[a], **self.point_to_lines[b]}):
       has_a = a in line.points
       has_b = b in line.points
       if has_a == has_b:
@@ -954,7 +1201,7 @@ class DDAR:
         points.append(b)
       self.force_collinear(points)
 
-    for line in list(self.lines):
+    for line in list(self.point_to_lines[b]):
       if b in line.points:
         main_pair = line.main_pair
         direction = line.direction
@@ -969,14 +1216,18 @@ class DDAR:
             direction=direction,
             value=line.value,
         )
-        for x, y in itertools.permutations(line2.points, 2):
+        for x, y in itertools.combinations(line2.points, 2):
           if not self.num_identical(x, y):
-            self.pair_to_line[x, y] = line2
+            self.pair_to_line[pair_key(x, y)] = line2
         self.lines.remove(line)
-        self.lines.add(line2)
+        self.lines.append(line2)
+        self._unregister_line(line)
+        self._register_line(line2)
 
-    # merge in circles
-    for circle in list(self.circles):
+    # merge in circles; the index also covers centers
+    for circle in list(
+        {**self.point_to_circles[a], **self.point_to_circles[b]}
+    ):
       has_a = a in circle.points
       has_b = b in circle.points
       if has_a == has_b:
@@ -987,7 +1238,7 @@ class DDAR:
       else:
         points.append(b)
       self.force_concyclic(points, circle.centers)
-    for circle in list(self.circles):
+    for circle in list(self.point_to_circles[b]):
       if b in circle.points or b in circle.centers:
         defining_points = circle.defining_points
         if b in defining_points:
@@ -998,33 +1249,37 @@ class DDAR:
             centers=[x for x in circle.centers if x != b],
             value=circle.value,
         )
-        for x, y, z in itertools.permutations(circle2.points, 3):
+        for x, y, z in itertools.combinations(circle2.points, 3):
           if self.num_identical(x, y):
             continue
           if self.num_identical(y, z):
             continue
           if self.num_identical(z, x):
             continue
-          self.triple_to_circle[x, y, z] = circle2
+          self.triple_to_circle[triple_key(x, y, z)] = circle2
         self.circles.remove(circle)
-        self.circles.add(circle2)
+        self.circles.append(circle2)
+        self._unregister_circle(circle)
+        self._register_circle(circle2)
 
     # merge in distances
     for x in self.points:
       if x == a or x == b:
         continue
       if not self.num_identical(x, a) and not self.num_identical(x, b):
-        d1 = self.pair_to_dist_mul[x, a]
-        d2 = self.pair_to_dist_mul[x, b]
+        d1 = self.pair_to_dist_mul[pair_key(x, a)]
+        d2 = self.pair_to_dist_mul[pair_key(x, b)]
         self.elim_dist_mul.force_one(d1 / d2)
 
     # remove 'b' from occuring in self.points
 
-    self.point_subst = {
-        x: y if y != b else a for x, y in self.point_subst.items()
-    }
+    self.struct_version += 1
+    moved = self._subst_rev.pop(b)
+    for x in moved:
+      self.point_subst[x] = a
+    self._subst_rev[a].extend(moved)
 
-    self.points = [x for x in self.points if x != b]
+    self.points.remove(b)
 
   def check_equal_points(self, a, b):
     a = self.point_subst[a]
@@ -1034,53 +1289,95 @@ class DDAR:
   #######  low-level functions
 
   def update_cache(self):
-    for a, b in itertools.combinations(self.points, 2):
-      if self.num_identical(a, b):
-        continue
-      dist = self.get_dist_mul(a, b)
-      self.dist_mul_cache[a, b] = dist
-      self.dist_mul_cache[b, a] = dist
-      direction = self.elim_angle.simplify(self.pair_to_dir[a, b])
-      self.direction_cache[a, b] = direction
-      self.direction_cache[b, a] = direction
+    """Refreshes the simplified distance / direction caches if stale."""
+    if self._indexed_points != self.points:
+      self._rebuild_point_index()
+
+    # either cache (and the ratio / angle memos derived from it) is still
+    # valid while its elimination engine and the point list are unchanged
+    dist_sig = (self.elim_dist_mul.version, self._index_epoch)
+    if self._dist_cache_sig != dist_sig:
+      self._dist_cache_sig = dist_sig
+      self._ratio_cache.clear()
+      for a, b in self._distinct_pairs:
+        self.dist_mul_cache[pair_key(a, b)] = self.get_dist_mul(a, b)
+
+    dir_sig = (self.elim_angle.version, self._index_epoch)
+    if self._dir_cache_sig != dir_sig:
+      self._dir_cache_sig = dir_sig
+      self._angle_cache.clear()
+      for a, b in self._distinct_pairs:
+        key = pair_key(a, b)
+        self.direction_cache[key] = self.elim_angle.simplify(
+            self.pair_to_dir[key]
+        )
 
   def get_dist_ratio(self, a, b, c, d):
-    return self.dist_mul_cache[c, d] / self.dist_mul_cache[a, b]
+    key = (id(a), id(b), id(c), id(d))
+    res = self._ratio_cache.get(key)
+    if res is None:
+      res = self.dist_mul_cache[pair_key(c, d)] / self.dist_mul_cache[
+          pair_key(a, b)
+      ]
+      self._ratio_cache[key] = res
+    return res
 
   def get_point_angle(self, a, b, c, d):
-    return self.direction_cache[c, d] - self.direction_cache[a, b]
+    key = (id(a), id(b), id(c), id(d))
+    res = self._angle_cache.get(key)
+    if res is None:
+      res = self.direction_cache[pair_key(c, d)] - self.direction_cache[
+          pair_key(a, b)
+      ]
+      self._angle_cache[key] = res
+    return res
 
   def get_dist_mul(self, a, b):
-    dist_mul = self.pair_to_dist_mul[a, b]
+    dist_mul = self.pair_to_dist_mul[pair_key(a, b)]
     return self.elim_dist_mul.simplify(dist_mul)
 
   def get_dist_add(self, a, b):
-    dist_add = self.pair_to_dist_add[a, b]
+    dist_add = self.pair_to_dist_add[pair_key(a, b)]
     return self.elim_dist_add.simplify(dist_add)
 
   def get_point_dir(self, a, b):
-    return self.elim_angle.simplify(self.pair_to_dir[a, b])
+    return self.elim_angle.simplify(self.pair_to_dir[pair_key(a, b)])
 
   def get_arc(self, circle, a, b):
-    c = next(
-        c
-        for c in circle.defining_points
-        if not (self.num_identical(a, c) or self.num_identical(b, c))
-    )
-    ang = self.pair_to_dir[b, c] - self.pair_to_dir[a, c]
+    # the chosen third point depends only on the defining-point list and
+    # the identity groups of a and b, so it is memoized; the stored list
+    # reference both validates the hit and keeps the id from being reused
+    rep = self._num_rep
+    key = (id(circle.defining_points), rep[a], rep[b])
+    entry = self._arc_third.get(key)
+    if entry is not None and entry[0] is circle.defining_points:
+      c = entry[1]
+    else:
+      c = next(
+          c
+          for c in circle.defining_points
+          if not (self.num_identical(a, c) or self.num_identical(b, c))
+      )
+      self._arc_third[key] = (circle.defining_points, c)
+    ang = self.pair_to_dir[pair_key(b, c)] - self.pair_to_dir[
+        pair_key(a, c)
+    ]
     return ang, c
 
   # debugging
 
   def lines_sanity_check(self):
+    """Debug-only consistency check of pair_to_line against self.lines."""
+    if not __debug__:
+      # the asserts below are stripped under -O; skip the O(N^2) scan too
+      return
     lines_set = set()
     for a, b in itertools.combinations(self.points, 2):
       if not self.num_identical(a, b):
-        lines_set.add(self.pair_to_line[a, b])
-    assert lines_set == self.lines
+        lines_set.add(self.pair_to_line[pair_key(a, b)])
+    assert lines_set == set(self.lines)
     for line in lines_set:
       for a, b in itertools.combinations(line.points, 2):
         if self.num_identical(a, b):
           continue
-        assert line == self.pair_to_line[a, b]
-        assert line == self.pair_to_line[b, a]
+        assert line == self.pair_to_line[pair_key(a, b)]
@@ -26,6 +26,7 @@ import numericals as ng
 
 
 class ElimVar:
+  __slots__ = ('value', 'name')
 
   def __init__(
       self, value: int | float | fractions.Fraction, name: str
@@ -38,16 +39,18 @@ class ElimVar:
 
 
 class ElimLHS(ElimVar):
-  pass
+  __slots__ = ()
 
 
 class ElimRHS(ElimVar):
-  pass
+  __slots__ = ()
 
 
 class LinComb:
   """Linear combination of variables and constants."""
 
+  __slots__ = ('d',)
+
   def __init__(self, d: dict[Any, fractions.Fraction]) -> None:
     self.d = d
 
@@ -130,6 +133,7 @@ class ElimCore:
   def __init__(self):
     self.instantiated = dict()
     self.free_to_usage = collections.defaultdict(set)
+    self.version = 0  # bumped whenever a constraint actually lands
 
   def simplify(self, comb: LinComb) -> LinComb:
     updates = list(comb.d.items())
@@ -149,7 +153,7 @@ class ElimCore:
     if not lhs:
       return False
     pivot = min(lhs, key=lambda x: len(self.free_to_usage[x]))
-    del lhs[lhs.index(pivot)]
+    lhs.remove(pivot)
     coef = fractions.Fraction(-1) / added_eq.d[pivot]
     added_eq *= coef
 
@@ -166,6 +170,7 @@ class ElimCore:
     self.instantiated[pivot] = added_eq
     for y in lhs:
       self.free_to_usage[y].add(pivot)
+    self.version += 1
     return True
 
   def display(self) -> None:
@@ -181,6 +186,7 @@ class ElimCore:
       res.instantiated[v] = lc.copy()
     for v, usage in self.free_to_usage.items():
       res.free_to_usage[v] = set(usage)
+    res.version = self.version
     return res
 
   def was_encountered(self, comb: LinComb) -> bool:
@@ -234,6 +240,8 @@ def prime_decomposition(n: int) -> list[tuple[int, int]]:
 class DistMul:
   """Multiplicative distance."""
 
+  __slots__ = ('comb', '_key', '_value', '_hash')
+
   def __init__(self, comb):
     self.comb = comb
     self._key = None
@@ -345,10 +353,16 @@ class ElimDistMul:
   def was_encountered(self, dist_mul: DistMul) -> bool:
     return self.core.was_encountered(dist_mul.comb)
 
+  @property
+  def version(self) -> int:
+    return self.core.version
+
 
 class DistAdd:
   """Additive distance."""
 
+  __slots__ = ('comb', '_key', '_value', '_hash')
+
   def __init__(self, comb: LinComb) -> None:
     self.comb = comb
     self._key = None
@@ -424,8 +438,13 @@ class ElimDistAdd:
   def was_encountered(self, dist_add: DistAdd) -> bool:
     return self.core.was_encountered(dist_add.comb)
 
+  @property
+  def version(self) -> int:
+    return self.core.version
+
 
 class AngleUnit(ElimRHS):
+  __slots__ = ()
 
   def __init__(self):
     super().__init__(1, "pi")
@@ -437,6 +456,8 @@ angle_unit = AngleUnit()
 class FormalAngle:
   """Formal angle."""
 
+  __slots__ = ('comb', '_key', '_value', '_hash')
+
   def __init__(self, comb: LinComb) -> None:
     self.comb = comb
     const = self.comb.d.get(angle_unit, fractions.Fraction(0))
@@ -520,3 +541,7 @@ class ElimAngle:
 
   def was_encountered(self, angle):
     return self.core.was_encountered(angle.comb)
+
+  @property
+  def version(self) -> int:
+    return self.core.version
@@ -17,11 +17,23 @@
 
 import dataclasses
 import fractions
+import re
+
 import numpy as np
 
 
 Fraction = fractions.Fraction
 
+# a point token looks like name@x_y; names may contain primes (x'), so
+# anything up to the '@' counts as the name
+_POINT_RE = re.compile(r'([^\s@]+)@([-+\d.eE]+)_([-+\d.eE]+)')
+
+# constant tokens in predicates: integers, angles as fractions of pi,
+# and plain fractions
+_INT_RE = re.compile(r'-?\d+')
+_PI_FRAC_RE = re.compile(r'(-?\d+)pi/(-?\d+)')
+_FRAC_RE = re.compile(r'(-?\d+)/(-?\d+)')
+
 
 class AGPoint:
   """Alpha geometry point, containing a name and a numerical value."""
@@ -63,18 +75,14 @@ class AGPredicate:
     constants = []
     for arg in args:
       if arg[0].isnumeric() or arg[0] == '-':
-        if arg.isnumeric() or arg[0] == '-' and arg[1:].isnumeric():
+        if _INT_RE.fullmatch(arg):
           constants.append(int(arg))
-        elif 'pi/' in arg:
-          num, den = arg.split('pi/')
-          num = int(num)
-          den = int(den)
-          constants.append(Fraction(num * 180, den))
+        elif match := _PI_FRAC_RE.fullmatch(arg):
+          constants.append(Fraction(int(match[1]) * 180, int(match[2])))
+        elif match := _FRAC_RE.fullmatch(arg):
+          constants.append(Fraction(int(match[1]), int(match[2])))
         else:
-          num, den = arg.split('/')
-          num = int(num)
-          den = int(den)
-          constants.append(Fraction(num, den))
+          raise ValueError(f'Cannot parse constant {arg}')
       else:
         points.append(arg)
     return AGPredicate(name=pred, points=points, constants=constants)
@@ -108,6 +116,26 @@ class AGProblem:
     goal = ' ? ' + str(self.goal)
     return points + preds + goal
 
+  @classmethod
+  def from_parts(cls, points, preds, goal):
+    """Builds a problem from already decomposed parts.
+
+    Args:
+      points: iterable of (name, x, y) triples.
+      preds: iterable of predicate strings.
+      goal: goal predicate string, or None.
+    """
+    name_to_point = {
+        name: AGPoint(name=name, value=np.array([x, y]))
+        for name, x, y in points
+    }
+    preds = [
+        AGPredicate.parse(pred).replace_points(name_to_point) for pred in preds
+    ]
+    if goal is not None:
+      goal = AGPredicate.parse(goal).replace_points(name_to_point)
+    return cls(points=list(name_to_point.values()), preds=preds, goal=goal)
+
   @classmethod
   def parse(cls, line):
     """Parse an AlphaGeometry problem string."""
@@ -122,14 +150,12 @@ class AGProblem:
       points, constraints = step.split('=')
       new_points = []
       for point in points.split():
-        if '@' not in point:
+        match = _POINT_RE.fullmatch(point)
+        if match is None:
           raise ValueError(f'Need a value for point {point}')
-        name, value = point.split('@')
+        name, x, y = match.groups()
         new_points.append(name)
-        x, y = value.split('_')
-        x = float(x)
-        y = float(y)
-        value = np.array([x, y])
+        value = np.array([float(x), float(y)])
         name_to_point[name] = AGPoint(name=name, value=value)
       for constraint in constraints.strip().split(','):
         constraint = constraint.strip()
@@ -15,468 +15,25 @@
 
 """Test AlphaGeometry's logic core on IMO problems."""
 
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import io
+import os
+import pickle
+import sys
+
 from ddar import DDAR
 from parse import AGProblem
+from problems import problems_with_aux, problems_without_aux
 
 
-problems_without_aux = {
-    "2000_p1": (
-        "a@-0.5224995081800106_0.10855387073174794 = ;"
-        " b@-0.18661048092098675_0.19019216505952974 = ;"
-        " g1@-0.4843181580129312_-0.04853780631339801 = ;"
-        " g2@-0.12022634032706143_-0.08293583930559657 = ;"
-        " m@-0.3631425485390431_0.05847659536258823 = ;"
-        " n@-0.3853283338800269_-0.17635261459308932 = ;"
-        " c@-0.6410940637479596_-0.009079906237506334 = ;"
-        " d@0.030683990770088265_0.15419668241805734 = ;"
-        " e@-0.4039049526120616_0.22618764770100208 = ;"
-        " p@-0.48422076136091424_0.029048367665792673 = ;"
-        " q@-0.242064335717172_0.08790482305938377 = perp a b a g1, perp a b b"
-        " g2, cong a g1 g1 m, cong b g2 g2 m, cong a g1 g1 n, cong b g2 g2 n,"
-        " cong a g1 g1 c, para a b m c, cong b g2 g2 d, para a b m d, coll a c"
-        " e, coll b d e, coll a n p, coll c d p, coll b n q, coll c d q ? cong"
-        " e p e q"
-    ),
-    "2002_p2a": (
-        "b@-0.18075519076447844_0.5513976830149603 = ;"
-        " c@0.8522007165079879_0.2744862016779728 = ;"
-        " o@0.33572276287175473_0.41294194234646653 = ;"
-        " a@0.3433712525219472_0.9476016185166477 = ;"
-        " d@0.01327703800966776_0.8394958348788117 = ;"
-        " e@-0.12348185424562272_0.6868955667692053 = ;"
-        " f@0.8025758696393371_0.6736479940939089 = ;"
-        " j@0.6658169773840342_0.5210477259843025 = coll b c o, cong b o c o,"
-        " cong b o o a, cong b o o d, cong b d a d, eqangle a b a d b d b a,"
-        " cong b o o e, cong o e a e, eqangle a o a e o e o a, cong b o o f,"
-        " cong o f a f, eqangle a o a f o f o a, coll c a j, para o j a d ?"
-        " eqangle e c e j e j e f"
-    ),
-    "2002_p2b": (
-        "b@0.3472701271194023_0.6964470552566171 = ;"
-        " c@-0.9710281752265395_0.5139166247976223 = ;"
-        " o@-0.3118790240535686_0.6051818400271197 = ;"
-        " a@-0.31931426608015767_1.2705777072963271 = ;"
-        " d@0.12238962119565994_1.1093818863939706 = ;"
-        " e@0.260653079562489_0.9443188821400471 = ;"
-        " f@-0.8918463696962162_0.9314406651834002 = ;"
-        " j@-0.7535829113293862_0.7663776609294763 = coll b c o, cong b o c o,"
-        " cong b o o a, cong b o o d, cong b d a d, eqangle a b a d b d b a,"
-        " cong b o o e, cong o e a e, eqangle a o a e o e o a, cong b o o f,"
-        " cong o f a f, eqangle a o a f o f o a, coll c a j, para o j a d ?"
-        " eqangle c e c j c j c f"
-    ),
-    "2003_p4": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@1.3505524882018327_1.3661895740316943 ="
-        " ; o@0.5_0.8563648602858344 = ;"
-        " b1@-0.20522354597272877_1.5535165827523483 = ;"
-        " d1@1.2052235459727287_0.15921313781932053 = ;"
-        " x@0.560291280698391_0.566778494577556 = ;"
-        " d@-0.4323646433488392_1.1940880394805242 = ;"
-        " p@1.1989859866653991_0.7754975061085783 = ;"
-        " q@0.38331067165828_0.3877487530542891 = ; r@-0.4323646433488391_-0.0"
-        " = cong a o b o, cong b o c o, cong a o o b1, cong a b1 c b1, eqangle"
-        " c a c b1 a b1 a c, cong a o o d1, cong a d1 c d1, eqangle c a c d1 a"
-        " d1 a c, coll a c x, coll b b1 x, coll d1 x d, cong a o o d, coll b c"
-        " p, perp b c d p, coll a c q, perp a c d q, coll a b r, perp a b d r ?"
-        " cong p q q r"
-    ),
-    "2004_p5": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@-0.24938856912238253_0.6547036984730146"
-        " = ; o@0.5_0.5653092857516873 = ;"
-        " d@0.7037641142060632_1.2919830600953754 = ;"
-        " p@1.9602382123421425_1.1215406301036281 = cong a o b o, cong b o c o,"
-        " cong a o o d, eqangle b a b d b p b c, eqangle d a d b d p d c ? cong"
-        " a p c p"
-    ),
-    "2005_p5": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@-1.1593575747631677_1.1505876678915776 ="
-        " ; d@0.934132499882376_2.261431756621179 = ;"
-        " e@-0.5470501721306618_0.8243270454446661 = ;"
-        " f@0.264882598140477_0.6412515561621368 = ;"
-        " p@1.029766570035929_-1.0219769483391574 = ;"
-        " q@0.9860589134913976_0.4786399316211652 = ;"
-        " r@-0.9139754938383713_0.9070617683939022 = ;"
-        " o1@1.6565458875321581_0.6393760073775907 = ;"
-        " o2@-0.6848708734187714_-0.5604962945594549 = ;"
-        " m@-0.05809155592254278_1.1008566611572932 = cong a d b c, coll b c e,"
-        " coll a d f, cong b e d f, coll a c p, coll b d p, coll b d q, coll e"
-        " f q, coll a c r, coll e f r, cong a o1 p o1, cong d o1 p o1, cong b"
-        " o2 p o2, cong c o2 p o2, cong p o1 o1 m, cong p o2 o2 m ? cyclic p"
-        " q r m"
-    ),
-    "2007_p4": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@0.6476304100773809_0.5128375346260048 ="
-        " ; o@0.5_0.03392602193818622 = ; r@0.5_-0.4672236313237414 = ;"
-        " l@0.32381520503869043_0.2564187673130024 = ;"
-        " k@0.8238152050386904_0.2564187673130024 = ;"
-        " p@0.5842053898316135_0.09178336794129861 = ;"
-        " q@0.5634250202457675_-0.04616946463903519 = ;"
-        " l1@0.6026775147432494_0.21441265731994444 = ;"
-        " k1@0.6137710775290177_0.28805852792789105 = cong a o b o, cong b o c"
-        " o, cong a o o r, cong a r b r, eqangle b a b r a r a b, coll a c l,"
-        " cong a l c l, coll b c k, cong b k c k, coll c r p, coll o k p, coll"
-        " c r q, coll o l q, coll c r l1, perp c r l l1, coll c r k1, perp c r"
-        " k k1 ? eqratio k k1 l l1 r q r p"
-    ),
-    "2010_p4": (
-        "s@-0.7611737196136361_-0.40370638784870616 = ;"
-        " c@-0.0007067579817958136_-0.3033923353015988 = ;"
-        " p@-0.1822113404638438_-0.9068718401615601 = ;"
-        " o@0.07800490049618894_-0.9000945345238572 = ;"
-        " a@0.6290080533318122_-0.6579281344964434 = ;"
-        " b@-0.3516346922721884_-0.47859855582078886 = ;"
-        " m@-0.316805061166676_-1.3543787340166435 = ;"
-        " l@0.05300010278999306_-1.5014461785963644 = ;"
-        " k@-0.5139890514778195_-1.0086864336841042 = cong s c s p, eqangle c s"
-        " c p p c p s, perp s c c o, cong c o o a, coll s a b, cong c o o b,"
-        " coll c p m, cong c o o m, coll p b l, cong c o o l, coll p a k, cong"
-        " c o o k ? cong m k m l"
-    ),
-    "2012_p1": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@0.4951025014191702_0.7048803388401101 ="
-        " ; m@0.7879103203910601_0.29609543649443654 = ;"
-        " l@0.7841188433349491_1.116354602120888 = ; k@1.3642177092199852_-0.0"
-        " = ; j@1.3642177092199852_0.7088976427698718 = ;"
-        " f@0.7911578353276049_-0.4064813832481669 = ;"
-        " g@-0.003247514936544746_0.7025768197426036 = ;"
-        " s@1.5823156706552095_-0.8129627664963338 = ;"
-        " t@-0.006495029873089491_1.4051536394852069 = coll b c m, perp b c m"
-        " j, coll a c l, perp a c l j, coll a b k, perp a b k j, eqangle a b a"
-        " j a j a c, eqangle c a c j c j c b, coll b j f, coll m l f, coll c j"
-        " g, coll m k g, coll a f s, coll b c s, coll a g t, coll b c t ? cong"
-        " m s m t"
-    ),
-    "2013_p4": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@0.3904244609294138_0.8553047513326418 ="
-        " ; h@0.39042446092941385_0.27825544154475423 = ;"
-        " m@0.17243794508201882_0.3777606387355749 = ;"
-        " n@0.3904244609294139_-0.0 = ;"
-        " w@0.6976631475935844_0.42421345640022357 = ;"
-        " o1@0.6952122304647069_0.1026222504424215 = ;"
-        " o2@0.4216477631522574_0.5525274678641505 = ;"
-        " x@0.6927613133358295_-0.21896895551538056 = ;"
-        " y@0.1456323787109307_0.6808414793280774 = perp a c b h, perp a h b c,"
-        " coll a c m, coll b h m, coll a b n, coll c h n, coll b c w, cong b o1"
-        " n o1, cong n o1 w o1, cong c o2 m o2, cong m o2 w o2, coll w o1 x,"
-        " cong w o1 o1 x, coll w o2 y, cong w o2 o2 y ? coll x h y"
-    ),
-    "2014_p4": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@-0.6361501355461672_0.8841201429618984 ="
-        " ; p@0.5269404414135063_0.2556253704843347 = ;"
-        " q@-0.07493336321890945_0.580857598649632 = ;"
-        " m@1.0538808828270125_0.5112507409686694 = ;"
-        " n@-0.1498667264378189_1.161715197299264 = ;"
-        " x@1.20387765654127_1.9345006522689066 = ; o@0.5_1.0306888561473955 ="
-        " coll b c p, eqangle a b a p c a c b, coll b c q, eqangle b a b c a c"
-        " a q, coll a p m, cong a p p m, coll a q n, cong a q q n, coll b m x,"
-        " coll c n x, cong a o b o, cong b o c o ? cong o x o a"
-    ),
-    "2015_p4": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@-0.1788810505176882_1.1237260817288226 ="
-        " ; o@0.5_0.6556935055037864 = ;"
-        " d@0.6041124534516038_0.37736560553985365 = ;"
-        " e@0.34800847894924125_0.6214875342589038 = ;"
-        " f@-0.3243004288862612_0.6341812741511403 = ;"
-        " g@0.6973930207315753_-0.14491249530204564 = ;"
-        " o1@-0.2543791999202692_-0.9196048180465175 = ;"
-        " o2@-1.3214536503382723_-0.6024210077008001 = ;"
-        " k@-1.5087583998405383_-0.0 = ;"
-        " l@0.3006183151655072_-1.8884763948960144 = ;"
-        " x@1.0410453027958113_1.3652132879568735 = cong a o b o, cong b o c o,"
-        " coll b c d, coll b c e, cong a d a e, cong a o o f, cong a d a f,"
-        " cong a o o g, cong a d a g, cong b o1 d o1, cong b o1 f o1, cong c o2"
-        " e o2, cong c o2 g o2, coll a b k, cong b o1 o1 k, coll a c l, cong c"
-        " o2 o2 l, coll f k x, coll g l x ? coll x o a"
-    ),
-    "2016_p1": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; z@-0.2459289863425174_0.893287439726508 ="
-        " ; f@0.5_0.6562564320990589 = ;"
-        " c@-1.3837191245823954_-1.8161491514513521 = ;"
-        " d@0.5000000000000001_-1.816149151451352 = ;"
-        " e@1.4418595622911974_-0.5799463596761465 = ;"
-        " m@-0.4418595622911977_-0.5799463596761466 = ;"
-        " x@0.9999999999999997_-1.159892719352293 = ;"
-        " y@0.8403362523356933_-0.5799463596761465 = cong a f b f, eqangle a b"
-        " a f a f a z, eqangle b a b f a f a b, coll a f c, perp b f b c, coll"
-        " a z d, cong a d c d, eqangle c a c d a d a c, cong a e d e, eqangle a"
-        " c a d a d a e, eqangle d a d e a e a d, coll f c m, cong f m c m,"
-        " para a e m x, para a m e x, coll f x y, coll e m y ? coll y b d"
-    ),
-    "2017_p4": (
-        "r@0.12250061370076071_0.1745757703310673 = ;"
-        " s@0.688689348912779_-0.29208565996111036 = ;"
-        " t@1.2548780841247973_-0.758747090253288 = ;"
-        " o@0.7469921665521145_0.355453789765812 = ;"
-        " j@0.8975340376941425_-0.2770362912081018 = ;"
-        " o1@0.823437479944976_-0.7054011833794449 = ;"
-        " a@0.4323784222303661_-0.8952948222792333 = ;"
-        " b@0.3914254107175586_-0.7539022427192877 = ;"
-        " k@1.3964298754578932_0.3860678347214237 = coll r s t, cong r s s t,"
-        " cong r o s o, eqangle s r s o r o r s, cong s o o j, cong s o1 t o1,"
-        " cong s o1 j o1, cong s o1 o1 a, perp r o r a, cong s o1 o1 b, perp r"
-        " o r b, coll j a k, cong s o o k ? perp k t o1 t"
-    ),
-    "2022_p4": (
-        "b@0.3588043791560098_-0.5704493571376925 = ;"
-        " c@0.5619898856538734_0.3909941989819614 = ;"
-        " d@-0.23706341836814526_0.09817032532337344 = ;"
-        " e@-0.9872871304414671_-0.5365126219012428 = ;"
-        " t@-0.053707064224109494_-0.3382499846058636 = ;"
-        " a@-0.8184747996893912_-0.5929275715530083 = ;"
-        " p@-2.1946202520600187_-0.6192028111910576 = ;"
-        " q@-0.2597226643125859_-0.5822591162454633 = ;"
-        " r@-1.5007430438119111_-0.36492213812469765 = ;"
-        " s@0.195685046910649_-0.9318469883390356 = cong b c d e, cong b t d t,"
-        " cong c t e t, eqangle d b d t b t b d, eqangle e c e t c t c e,"
-        " eqangle b t b a e a e t, coll b a p, coll c d p, coll b a q, coll c t"
-        " q, coll c d r, coll e a r, coll d t s, coll e a s ? cyclic p q r s"
-    ),
-}
+_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "alphageometry", "ddar"
+)
 
-problems_with_aux = {
-    "2001_p5a": (
-        "a@0.3298517509465857_1.4439692260026906 = ;"
-        " b@0.7379367796811421_0.6243724929135032 = ;"
-        " c@-0.44500078968137113_0.27466310281841355 = ;"
-        " p@0.2707582474456216_0.4862614684562726 = ;"
-        " q@-0.00025251512413585993_0.9458190369448746 = ;"
-        " r@-0.1758973264001069_0.6807588576698682 = ;"
-        " t@0.9550742881108957_0.18827418003981203 = ;"
-        " u@-0.4450007896813813_0.2746631028183983 = ;"
-        " x@0.4792133626001627_0.6403365205958365 = ;"
-        " o@0.5866446683502685_0.276936133597599 = aconst a b a c 60, eqangle a"
-        " b a p a p a c, coll p b c, eqangle b a b q b q b c, coll q a c,"
-        " distseq a b b p a q q b 1 1 -1 -1, coll r a c, perp r b a p, coll t a"
-        " b, cong b t b p, coll u a c, perp u t a p, eqangle t b t x t x t p,"
-        " coll x b r, cong o b o t, cong o t o p ? acompute b a b c"
-    ),
-    "2003_p4b": (
-        "a@-2.0_0.0 = ; b@2.0_0.0 = ; c@1.9109057743109794_3.051295590654324 ="
-        " ; o@0.0_1.4685508816796977 = ;"
-        " d@-0.9732806727898079_3.7509545322323428 = ;"
-        " p@1.8880370834465432_3.834501629643334 = ;"
-        " q@0.4573782053283676_1.917250814821666 = ; r@-0.9732806727898079_0.0"
-        " = ; x@0.21813684153819998_1.7305942803610102 = ;"
-        " x'@0.21813684153820143_1.7305942803610088 = ;"
-        " xb@0.6401728961839753_1.3207013102933183 = ;"
-        " xd@-0.06405157724976585_2.209118607896344 = cong o a o b, cong o b o"
-        " c, cong o a o d, coll p b c, perp p d b c, coll q c a, perp q d c a,"
-        " coll r a b, perp r d a b, cong p q q r, eqangle b a b x b x b c,"
-        " eqangle d a d x d x d c, coll x' a c, eqangle b a b x' b x' b c, coll"
-        " xb b x', cong c xb c x', coll xd d x', cong c xd c x' ? coll x a c"
-    ),
-    "2005_p1": (
-        "a@0.0_3.4641016151377544 = ; b@-2.0_0.0 = ; c@2.0_0.0 = ;"
-        " a1@-0.4350517329096339_0.0 = ; a2@0.9469741497719774_0.0 = ;"
-        " b1@1.217525866454817_1.3552849549086916 = ;"
-        " b2@0.5265129251140116_2.552154477998579 = ;"
-        " c1@-0.7824741335451829_2.108816660229063 = ;"
-        " c2@-1.473487074885988_0.9119471371391762 = ;"
-        " x@-0.0_1.1547005383792515 = ;"
-        " p@-0.16450001622679433_1.3552849549086916 = cong a b b c, cong b c c"
-        " a, coll a1 b c, coll a2 b c, coll b1 c a, cong a1 a2 a2 b1, coll b2 c"
-        " a, cong a2 b1 b1 b2, coll c1 a b, cong b1 b2 b2 c1, coll c2 a b, cong"
-        " b2 c1 c1 c2, cong c1 c2 c2 a1, coll x a1 b2, coll x b1 c2, para p a1"
-        " a2 b1, para p b1 b c ? coll x c1 a2"
-    ),
-    "2008_p1b": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@0.290854532548588_0.7063937637795393 = ;"
-        " h@0.29085453254858795_0.2919875344608819 = ;"
-        " d@0.645427266274294_0.35319688188976966 = ;"
-        " e@0.145427266274294_0.35319688188976966 = ; f@0.5_0.0 = ;"
-        " a1@0.3905039838452928_0.6071309831641247 = ;"
-        " a2@0.9003505487032953_0.0992627806154146 = ;"
-        " b1@0.2055009708273334_0.49909692990195786 = ;"
-        " b2@0.08535356172125463_0.20729683387758152 = ;"
-        " c1@0.14083632305588817_-0.0 = ; c2@0.8591636769441118_-0.0 = ;"
-        " x@0.20720154868679602_0.20800868670467504 = ;"
-        " y@0.854104386031649_0.060071878854946054 = ;"
-        " z@0.29085453254858795_0.4144062293186577 = ;"
-        " t@0.09067630642791989_0.14097780649808872 = perp h a b c, perp h b c"
-        " a, perp h c a b, coll d b c, cong d b d c, coll e a c, cong e a e c,"
-        " coll f a b, cong f a f b, cong d a1 d h, coll a1 b c, cong d a2 d h,"
-        " coll a2 b c, cong e b1 e h, coll b1 c a, cong e b2 e h, coll b2 c a,"
-        " cong f c1 f h, coll c1 a b, cong f c2 f h, coll c2 a b, cong e x e"
-        " b1, cong f x f c1, cong f y f c1, cong d y d a1, cong d z d a1, cong"
-        " e z e b1, coll t a a1, cyclic a1 a2 b1 t ? cyclic c1 c2 b1 a1"
-    ),
-    "2008_p6": (
-        "x@4.96_-0.13 = ; y@-1.006896832888816_-1.253488108068277 = ;"
-        " z@-2.840284723857512_-4.911776273400683 = ;"
-        " o@2.8799999999999986_-5.489999999999999 = ;"
-        " w@6.909004923003877_-1.3884003936987552 = ;"
-        " a@-2.080746196980964_2.602229867485152 = ;"
-        " b@-1.6356942531718726_7.005065168739374 = ;"
-        " c@3.015094469495374_2.4365912907211023 = ;"
-        " d@1.627271672827975_1.1632975597981 = ;"
-        " i1@-0.5336859138585403_3.955774130812619 = ;"
-        " i2@1.4937014337487793_1.8726952212475092 = ;"
-        " f1@-0.5792688026773871_2.5534248527852306 = ;"
-        " f2@1.5136170751917972_2.4853963054210246 = ;"
-        " q@0.6999287191540016_4.624247192763765 = ;"
-        " t@2.032680584622158_2.16475810188334 = ;"
-        " p@-1.2353352672275948_2.7407229046275665 = ;"
-        " s@1.1871434839892263_1.3418266172024895 = ;"
-        " k@3.0667847835076225_0.25639986814788507 = ;"
-        " p'@-0.4881030250396932_5.358123408840009 = ;"
-        " ci@-1.929662061825108_4.096883633134149 = ;"
-        " ai@0.44955094305798904_4.956726967133048 = ;"
-        " e2@1.388524878059561_-1.363042371478294 = ;"
-        " ce@-2.442424147293411_-0.9757984266772713 = ;"
-        " ae@4.086801839440497_1.3838521928104057 = ;"
-        " c2@1.2719246196873397_1.3011934311661078 = ;"
-        " a2@1.9081358549908851_1.42098362984077 = ;"
-        " q'@1.4737857923057616_1.2599941370739938 = ;"
-        " e1@-0.2929579785797208_11.361725245075798 = ;"
-        " ce2@-3.4812611312229262_3.145713274802929 = ;"
-        " ae2@5.665025399448304_4.867838600241024 = ;"
-        " k'@3.0667847835076225_0.25639986814788507 = cong o x o y, cong o y o"
-        " z, cong o w o x, perp a z o z, perp a x o x, perp b z o z, perp b w o"
-        " w, perp c y o y, perp c w o w, perp d x o x, perp d y o y, eqangle a"
-        " b a i1 a i1 a c, eqangle c a c i1 c i1 c b, eqangle b c b i1 b i1 b"
-        " a, eqangle a c a i2 a i2 a d, eqangle d a d i2 d i2 d c, eqangle c d"
-        " c i2 c i2 c a, perp f1 i1 a c, coll f1 a c, perp f2 i2 a c, coll f2 a"
-        " c, cong i1 q i1 f1, cong i2 t i2 f2, perp q i1 q t, perp t i2 t q,"
-        " cong i1 p i1 f1, cong i2 s i2 f2, perp p i1 p s, perp s i2 s p, coll"
-        " k q t, coll k p s, coll p' f1 i1, cong i1 p' i1 f1, perp ci i1 a b,"
-        " coll ci a b, perp ai i1 b c, coll ai b c, eqangle b c b e2 b e2 b a,"
-        " eqangle a b a e2 a e2 a c, eqangle c a c e2 c e2 c b, perp ce e2 a b,"
-        " coll ce a b, perp ae e2 b c, coll ae b c, perp c2 i2 a d, coll c2 a"
-        " d, perp a2 i2 c d, coll a2 c d, coll q' i2 f2, cong i2 q' i2 f2,"
-        " eqangle d a d e1 d e1 d c, eqangle c d c e1 c e1 c a, eqangle a c a"
-        " e1 a e1 a d, perp ce2 e1 a d, coll ce2 a d, perp ae2 e1 c d, coll ae2"
-        " c d, cong o k' o x, para k' o i1 f1 ? cong o k o x"
-    ),
-    "2009_p4a": (
-        "a@-0.13106393182449125_0.991373918244123 = ;"
-        " b@0.9235495324287674_-0.383479153475916 = ;"
-        " c@-0.7944148862784848_-0.6093746688323302 = ;"
-        " d@0.06456732307514113_-0.4964269111541231 = ;"
-        " e@-0.46273940905148797_0.1909996247058966 = ;"
-        " k@-0.29118373555788163_-0.22335934974252558 = ;"
-        " i@-0.0006430952247363558_-0.0004933013547075463 = ;"
-        " p@0.023225574464428453_-0.1820176011318129 = ;"
-        " r@-0.584141059528896_-0.1019576992651177 = ;"
-        " f@-0.46273940905148797_0.1909996247058966 = ;"
-        " s@-0.16978208508047374_0.06959797422848871 = cong a b a c, coll d b"
-        " c, eqangle a b a d a d a c, coll e a c, eqangle b a b e b e b c,"
-        " eqangle d a d k d k d c, eqangle c d c k c k c a, eqangle e b e k d k"
-        " d a, coll i a d, coll i b e, perp p k a d, coll p a d, perp r k a c,"
-        " coll r a c, perp f i a c, coll f a c, perp s k i f, coll s i f ?"
-        " acompute a b a c"
-    ),
-    "2009_p4b": (
-        "a@-0.13106393182449125_0.991373918244123 = ;"
-        " b@0.9235495324287674_-0.383479153475916 = ;"
-        " c@-1.5059170035445306_-0.06323954600913563 = ;"
-        " d@-0.2911837355578814_-0.22335934974252583 = ;"
-        " e@-0.7005467204012409_0.5545387182891501 = ;"
-        " k@-0.6000728677070244_0.1793257918291189 = ;"
-        " i@-0.22485994124699302_0.2797996445233356 = ;"
-        " p@-0.24428573084663047_0.13242778711786796 = ;"
-        " r@-0.8184904676845108_0.4640671861174937 = ;"
-        " f@-0.5337490733961359_0.6824847860949803 = ;"
-        " s@-0.31533147341864937_0.39774339180660556 = cong a b a c, coll d b"
-        " c, eqangle a b a d a d a c, coll e a c, eqangle b a b e b e b c,"
-        " eqangle d a d k d k d c, eqangle c d c k c k c a, eqangle e b e k d k"
-        " d a, coll i a d, coll i b e, perp p k a d, coll p a d, perp r k a c,"
-        " coll r a c, perp f i a c, coll f a c, perp s k i f, coll s i f ?"
-        " acompute a b a c"
-    ),
-    "2011_p6": (
-        "a@0.0_0.0 = ; b@1.0283476899183277_0.034528533896763136 = ;"
-        " c@0.40058612850850084_0.78168033091214 = ;"
-        " o@0.5069062850742152_0.23371071212254715 = ;"
-        " p@0.9656829052769494_0.5516709164939837 = ;"
-        " q@0.8162546035654066_0.767277178785135 = ;"
-        " pa@0.529747243327681_0.18539507681495893 = ;"
-        " pb@-0.11614279998371435_1.1060719342164795 = ;"
-        " pc@1.000512815552948_-0.4856525296585569 = ;"
-        " qa@0.3431250264084389_0.36975078148314655 = ;"
-        " qb@0.14614247983733242_1.110688175192835 = ;"
-        " qc@0.8658834578006742_-0.7107965140835621 = ;"
-        " a1@1.9743170244664063_1.1428641869408247 = ;"
-        " b1@1.0779509857836376_-0.35615077399839645 = ;"
-        " c1@-0.39724046699762716_1.1011245937873375 = ;"
-        " o1@0.7936534995773209_0.8313581049087352 = ;"
-        " x@0.2654452205404853_-0.2695498894774664 = ;"
-        " m@0.2654452205404853_-0.2695498894774664 = cong o a o b, cong o b o"
-        " c, cong o p o a, perp q p o p, cong b p b pa, cong c p c pa, perp b c"
-        " p pa, cong c p c pb, cong a p a pb, perp c a p pb, cong a p a pc,"
-        " cong b p b pc, perp a b p pc, cong b q b qa, cong c q c qa, perp b c"
-        " q qa, cong c q c qb, cong a q a qb, perp c a q qb, cong a q a qc,"
-        " cong b q b qc, perp a b q qc, coll a1 pb qb, coll a1 pc qc, coll b1"
-        " pa qa, coll b1 pc qc, coll c1 pa qa, coll c1 pb qb, cong o1 a1 o1 b1,"
-        " cong o1 b1 o1 c1, cong o x o a, coll x o o1, cyclic b1 b pa m, cyclic"
-        " b1 a1 c1 m ? cong o1 a1 o1 x"
-    ),
-    "2013_p3": (
-        "a@0.07377274994178976_-0.997275078083287 = ;"
-        " b@-0.9291456762431524_0.36971382489522236 = ;"
-        " c@0.9187738953521658_-0.37732328693639766 = ;"
-        " ia@0.5823388125357152_2.313222520403771 = ;"
-        " a1@-0.3052939208820899_0.11751647783553433 = ;"
-        " ib@1.0143630192653978_-1.1417706638836451 = ;"
-        " b1@0.616315677503773_-0.5992277363216619 = ;"
-        " ic@-1.7717719119880044_-0.7137583697528488 = ;"
-        " c1@-0.7072412268578879_0.06725560704682916 = ;"
-        " o@-0.37870444636130307_-0.9277645168182471 = ;"
-        " b0@-0.5947165497261434_0.7997320753254628 = ;"
-        " c0@0.7983509159005565_0.5857259282600635 = eqangle b c b ia b ia b a,"
-        " eqangle c b c ia c ia c a, coll a1 b c, perp ia a1 b c, eqangle a c a"
-        " ib a ib a b, eqangle c a c ib c ib c b, coll b1 a c, perp ib b1 a c,"
-        " eqangle b a b ic b ic b c, eqangle a b a ic a ic a c, coll c1 a b,"
-        " perp ic c1 a b, cong o a1 o b1, cong o a1 o c1, cyclic o a b c, coll"
-        " b0 ia ic, cyclic a b c b0, coll c0 ia ib, cyclic a b c c0 ? perp a"
-        " b a c"
-    ),
-    "2019_p2": (
-        "a@0.0_0.0 = ; b@1.0_0.0 = ; c@-0.7858234607409786_1.453721281271722 ="
-        " ; a1@-0.294791634188577_1.0540046061728465 = ;"
-        " b1@-0.25967235866767224_0.4803766403172407 = ;"
-        " p@-0.22206498335262229_0.7939761111865026 = ;"
-        " q@-1.082011648284123_0.7939761111865026 = ;"
-        " p1@-0.1109779712303118_1.7203057986524242 = ;"
-        " q1@0.003897850865149388_1.152665432722081 = ;"
-        " o@0.5_1.2095329349302175 = ; a2@-0.554946252758179_1.9841672515418574"
-        " = ; b2@-0.6784220374653078_0.6400670252420094 = coll b c a1, coll a c"
-        " b1, coll a a1 p, coll b b1 q, para a b p q, coll b1 p p1, eqangle a b"
-        " a c p1 p p1 c, coll a1 q q1, eqangle b a b c q1 q q1 c, cong o a o b,"
-        " cong o b o c, cong o a2 o a, coll a2 a a1, cong o b2 o b, coll b2 b"
-        " b1 ? cyclic p q p1 q1"
-    ),
-    "2021_p3": (
-        "a@0.35158228874560216_0.6253011491766167 = ;"
-        " b@-0.32787335987583544_-0.11434443729989269 = ;"
-        " c@0.593611241171965_-0.13630297414077203 = ;"
-        " d@0.25541529417090475_0.19047220899818684 = ;"
-        " e@0.4472680874521529_0.32420205294349663 = ;"
-        " f@0.18152091649019214_0.4401748003500804 = ;"
-        " x@0.1647645897963786_1.2131693707344662 = ;"
-        " o1@0.7063662227386552_0.3187883084445305 = ;"
-        " o2@0.0513262541690787_0.687748158526416 = ;"
-        " y@1.5549937258179136_-0.15921225844489367 = ;"
-        " da@0.24023420886499053_-0.44659830430440767 = ;"
-        " db@0.6811243375628278_0.3257576028873138 = ;"
-        " dc@-0.07354195379055742_0.49265999240284974 = ;"
-        " q@0.22915675122419496_0.07174151089699222 = ;"
-        " m@0.49881279704621323_0.5293204195487172 = ;"
-        " k@0.5823757264495235_0.7709477031088625 = ;"
-        " y'@1.5549937258179136_-0.15921225844489367 = ;"
-        " e'@0.4472680874521529_0.32420205294349663 = ;"
-        " p@0.4052374543908715_0.4564618636983748 = ;"
-        " m'@0.49881279704621323_0.5293204195487172 = eqangle a b a d a d a c,"
-        " eqangle d e d a c d c b, coll e a c, eqangle d f d a b d b c, coll f"
-        " a b, cong x b x c, eqangle b x b c c b c x, coll x a c, cong o1 a o1"
-        " d, cong o1 d o1 c, cong o2 e o2 x, cong o2 x o2 d, coll y e f, coll y"
-        " b c, cong b d b da, cong c d c da, perp b c d da, cong c d c db, cong"
-        " a d a db, perp c a d db, cong a d a dc, cong b d b dc, perp a b d dc,"
-        " cong q da q db, cong q db q dc, coll m a y, cyclic a b c m, cong y k"
-        " y d, cyclic a d c k, coll y' b c, eqangle d y' d c b d b c, coll e' f"
-        " y', cyclic f b c e', coll p a c, coll p d k, coll m' p b, cyclic b d"
-        " k m' ? coll o1 o2 y"
-    ),
-}
 
 explanation_without_aux = """
 We run the logical core DDAR on some easier IMO problems that can be solved by DDAR alone.
@@ -488,14 +45,32 @@ auxiliary points. This is not a full AlphaGeometry system, only a test of the lo
 """
 
 
-def print_problem_and_solve(problems_dict: dict[str, str]) -> None:
-  """Prints problem ID and its proving status."""
-  for name, pstring in problems_dict.items():
+@functools.cache
+def _parse_problem(pstring: str) -> AGProblem:
+  """Parses a problem string once per process; DDAR never mutates it."""
+  return AGProblem.parse(pstring)
+
+
+def _solve_one(item: tuple[str, str]) -> str:
+  """Solves a single problem and returns its captured report.
+
+  Reports are cached on disk keyed by the problem text, so repeated
+  driver runs skip the deduction closure; pass --no-cache to disable.
+  """
+  name, pstring = item
+  cache_path = None
+  if "--no-cache" not in sys.argv:
+    key = hashlib.sha256(f"{name}\n{pstring}".encode()).hexdigest()
+    cache_path = os.path.join(_CACHE_DIR, key + ".pkl")
+    if os.path.exists(cache_path):
+      with open(cache_path, "rb") as f:
+        return pickle.load(f)
+  out = io.StringIO()
+  with contextlib.redirect_stdout(out):
     print("Problem:", name)
-    problem = AGProblem.parse(pstring)
+    problem = _parse_problem(pstring)
     ddar = DDAR(problem.points)
-    for pred in problem.preds:
-      ddar.force_pred(pred)
+    ddar.force_preds(problem.preds)
     ddar.deduction_closure()
     if ddar.check_pred(problem.goal):
       print(" Proven :-)")
@@ -504,13 +79,44 @@ def print_problem_and_solve(problems_dict: dict[str, str]) -> None:
       print()
       print("!!! Problem not solved, missing an auxiliary point?")
     print()
+  report = out.getvalue()
+  if cache_path is not None:
+    os.makedirs(_CACHE_DIR, exist_ok=True)
+    with open(cache_path, "wb") as f:
+      pickle.dump(report, f)
+  return report
 
 
-if __name__ == "__main__":
+def _solve_problem_set(problems_dict: dict[str, str]) -> str:
+  """Solves a whole problem set and returns its combined report.
+
+  The problems are independent, so they are solved in worker processes;
+  the reports still come out in dictionary order.
+  """
+  with concurrent.futures.ProcessPoolExecutor() as ex:
+    return "".join(ex.map(_solve_one, problems_dict.items()))
+
+
+def print_problem_and_solve(problems_dict: dict[str, str]) -> None:
+  """Prints problem ID and its proving status."""
+  sys.stdout.write(_solve_problem_set(problems_dict))
+
+
+async def main() -> None:
+  """Solves both problem sets concurrently, printing in the usual order."""
+  easy, hard = await asyncio.gather(
+      asyncio.to_thread(_solve_problem_set, problems_without_aux),
+      asyncio.to_thread(_solve_problem_set, problems_with_aux),
+  )
+
   # Easier problems that can be solved without auxiliary points.
   print(explanation_without_aux)
-  print_problem_and_solve(problems_without_aux)
+  sys.stdout.write(easy)
 
   # Harder problems supplemented by auxiliary points found by a language model.
   print(explanation_with_aux)
-  print_problem_and_solve(problems_with_aux)
+  sys.stdout.write(hard)
+
+
+if __name__ == "__main__":
+  asyncio.run(main())